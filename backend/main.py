@@ -1,22 +1,34 @@
-import os, time, random, requests
+import asyncio, base64, os, threading, time, random
+import httpx
+import orjson
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Optional, Tuple
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from cachetools import TTLCache
 
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import Optional
 
 # ---- third-party (sign & submit) ----
 from solders.keypair import Keypair
 from solders.transaction import VersionedTransaction
-from solders.commitment_config import CommitmentLevel
-from solders.rpc.config import RpcSendTransactionConfig
-from solders.rpc.requests import SendVersionedTransaction
 
 load_dotenv()
 
+# The burn service exits at import time when its .env is incomplete
+try:
+    from services.burn_tokens import burn_tokens
+except (ImportError, SystemExit) as e:
+    print(f"[WARN] Burn service unavailable ({e}). Burns will be skipped until fixed.")
+    burn_tokens = None
+
 # ---------- Settings ----------
 WALLET_ADDRESS      = os.getenv("WALLET_ADDRESS", "").strip()
 WALLET_PRIVATE_KEY  = os.getenv("WALLET_PRIVATE_KEY", "").strip()
@@ -30,29 +42,62 @@ TOKEN_INITIAL_SUPPLY = float(os.getenv("TOKEN_INITIAL_SUPPLY", "0") or 0.0)  # h
 if not (WALLET_ADDRESS and WALLET_PRIVATE_KEY and TOKEN_MINT and SOLANA_RPC_URL):
     print("[WARN] Missing critical .env values. Claim/Buy/Burn will fail until provided.")
 
+# Parsed once at startup; a malformed key is reported here, not on the first trade
+WALLET_KP: Optional[Keypair] = None
+if WALLET_PRIVATE_KEY:
+    try:
+        WALLET_KP = Keypair.from_base58_string(WALLET_PRIVATE_KEY)
+    except Exception as e:
+        print(f"[WARN] Invalid WALLET_PRIVATE_KEY ({e}). Claim/Buy will fail until fixed.")
+# services.burn_tokens has already read it; don't leave the secret in the environment
+os.environ.pop("WALLET_PRIVATE_KEY", None)
+
+# ---------- HTTP ----------
+# Pooled HTTP/2 clients for every outbound call, so Solana RPC / DexScreener /
+# Pump Portal requests share multiplexed keep-alive connections instead of
+# re-handshaking TLS per call. Market-data reads run on the event loop
+# (ASYNC_CLIENT); the claim/buy/burn pipeline runs in worker threads (SESSION).
+_HTTP_LIMITS = httpx.Limits(max_connections=40, max_keepalive_connections=20)
+_HTTP_HEADERS = {"User-Agent": "tolkien-backend/1.0"}
+_JSON_HEADERS = {"Content-Type": "application/json"}  # for bodies pre-encoded with orjson
+
+SESSION = httpx.Client(
+    # retries re-attempt failed connects only, never a sent request
+    transport=httpx.HTTPTransport(http2=True, retries=2, limits=_HTTP_LIMITS),
+    headers=_HTTP_HEADERS,
+)
+ASYNC_CLIENT = httpx.AsyncClient(
+    transport=httpx.AsyncHTTPTransport(http2=True, retries=2, limits=_HTTP_LIMITS),
+    headers=_HTTP_HEADERS,
+)
+
+# Separate connect/read timeouts: fail fast on a dead host, bound a slow one
+_RPC_TIMEOUT = httpx.Timeout(8.0, connect=2.0)     # Solana RPC reads
+_TRADE_TIMEOUT = httpx.Timeout(60.0, connect=5.0)  # Pump Portal build + sendTransaction
+_MARKET_TIMEOUT = httpx.Timeout(5.0, connect=2.0)  # DexScreener / getTokenSupply
+
 # ---------- FastAPI ----------
-app = FastAPI(title="Tolkien Backend", version="1.0.0")
+app = FastAPI(title="Tolkien Backend", version="1.0.0", default_response_class=ORJSONResponse)
 
-allowed_origins = {
+_ORIGINS = (
     "http://localhost:5173",
     "http://127.0.0.1:5173",
     "http://localhost:3000",
     "http://127.0.0.1:3000",
     "http://localhost",
     "http://127.0.0.1",
-}
-if FRONTEND_ORIGIN:
-    allowed_origins.add(FRONTEND_ORIGIN)
+)
+ALLOWED_ORIGINS = _ORIGINS + ((FRONTEND_ORIGIN,) if FRONTEND_ORIGIN and FRONTEND_ORIGIN not in _ORIGINS else ())
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=list(allowed_origins),
+    allow_origins=list(ALLOWED_ORIGINS),
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
-def now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
+def ts_iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
 
 # ---------- Dashboard state ----------
 STATE = {
@@ -63,31 +108,45 @@ STATE = {
     "market_cap_usd": 0.0,
     "supply_burned_pct": 0.0,
     "last_goal_bucket": 0,     # integer bucket index we've last processed
-    "tx": [],                  # recent transactions
+    "pipeline_status": "idle", # "idle" | "claiming" | "buying back" | "burning"
+    "tx": deque(maxlen=50),    # recent transactions, newest first
+    "_version": 0,             # bumped on every write; keys the cached /dashboard body
 }
 
 GOAL_STEP = 50_000.0         # trigger size ($100k)
 LAMPORTS_PER_SOL = 1_000_000_000
 
+# STATE is written by the refresher (event loop), the goal pipeline (worker
+# thread) and the dev endpoints; hold this around writes and snapshots.
+_state_lock = threading.Lock()
+
+def _mark_dirty():
+    """Invalidate the cached /dashboard body after a STATE write (hold _state_lock)."""
+    STATE["_version"] += 1
+
 # ----- TX helpers -----
 def push_tx(kind: str, amount_sol: float, desc: str, sig: Optional[str] = None):
-    STATE["tx"].insert(0, {
+    item = {
         "signature": sig,
         "kind": kind,  # "claim" | "buyback" | "burn"
         "amount_sol": float(amount_sol or 0),
         "status": "confirmed" if sig else "recorded",
-        "timestamp": now_iso(),
+        "timestamp": time.time(),  # epoch seconds; formatted when the dashboard renders
         "description": desc
-    })
-    STATE["tx"] = STATE["tx"][:50]
+    }
+    with _state_lock:
+        STATE["tx"].appendleft(item)
+        _mark_dirty()
+
+# only the pubkey varies between getBalance calls
+_BALANCE_TMPL = b'{"jsonrpc":"2.0","id":1,"method":"getBalance","params":["%s",{"commitment":"confirmed"}]}'
 
 def get_balance_sol(pubkey: str) -> float:
     try:
-        payload = {"jsonrpc": "2.0", "id": 1, "method": "getBalance",
-                   "params": [pubkey, {"commitment": "confirmed"}]}
-        r = requests.post(SOLANA_RPC_URL, json=payload, timeout=30)
+        r = SESSION.post(SOLANA_RPC_URL, content=_BALANCE_TMPL % pubkey.encode(),
+                         headers=_JSON_HEADERS, timeout=_RPC_TIMEOUT)
         r.raise_for_status()
-        result = r.json()
+        result = orjson.loads(r.content)
         if "result" not in result or "value" not in result["result"]:
             raise RuntimeError(f"Invalid RPC response: {result}")
         lamports = result["result"]["value"]
@@ -96,137 +155,273 @@ def get_balance_sol(pubkey: str) -> float:
         print(f"[ERROR] Failed to get SOL balance for {pubkey}: {e}")
         return 0.0
 
+def _rpc_batch(calls: list[tuple[str, list]]) -> list[Optional[dict]]:
+    """POST several JSON-RPC calls as one batch; return the responses in call order."""
+    payload = [{"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+               for i, (method, params) in enumerate(calls)]
+    r = SESSION.post(SOLANA_RPC_URL, content=orjson.dumps(payload), headers=_JSON_HEADERS,
+                     timeout=_RPC_TIMEOUT)
+    r.raise_for_status()
+    result = orjson.loads(r.content)
+    if not isinstance(result, list):
+        raise RuntimeError(f"Invalid RPC batch response: {result}")
+    # batch responses may come back in any order; correlate by id
+    by_id = {item.get("id"): item for item in result}
+    return [by_id.get(i) for i in range(len(calls))]
+
+def get_balances_sol(pubkeys: list[str]) -> dict[str, float]:
+    """Fetch several SOL balances with one JSON-RPC batch request; failures read as 0.0."""
+    balances = {pk: 0.0 for pk in pubkeys}
+    if not pubkeys:
+        return balances
+    try:
+        replies = _rpc_batch([("getBalance", [pk, {"commitment": "confirmed"}]) for pk in pubkeys])
+        for pk, item in zip(pubkeys, replies):
+            value = ((item or {}).get("result") or {}).get("value")
+            if value is not None:
+                balances[pk] = value / LAMPORTS_PER_SOL
+            else:
+                print(f"[ERROR] Invalid RPC batch item for {pk}: {item}")
+    except Exception as e:
+        print(f"[ERROR] Failed to get SOL balances for {pubkeys}: {e}")
+    return balances
+
+def get_signature_statuses(sigs: list[str]) -> list[Optional[dict]]:
+    """Return the RPC status object (or None if unknown) for each signature, in one call."""
+    payload = {"jsonrpc": "2.0", "id": 1, "method": "getSignatureStatuses",
+               "params": [sigs, {"searchTransactionHistory": False}]}
+    r = SESSION.post(SOLANA_RPC_URL, content=orjson.dumps(payload), headers=_JSON_HEADERS,
+                     timeout=_RPC_TIMEOUT)
+    r.raise_for_status()
+    value = (orjson.loads(r.content).get("result") or {}).get("value")
+    return value if value else [None] * len(sigs)
+
+# Poll schedule for fresh signatures; the last delay repeats until the timeout
+_CONFIRM_DELAYS = (0.15, 0.2, 0.3, 0.5, 0.8, 1.2)
+
+def wait_for_confirmation(sig: str, timeout: float = 15.0) -> bool:
+    """Poll until `sig` is confirmed/finalized; False on timeout, raises if the tx failed."""
+    deadline = time.time() + timeout
+    attempt = 0
+    while True:
+        # a just-submitted tx is never confirmed yet, so wait before each poll
+        delay = _CONFIRM_DELAYS[min(attempt, len(_CONFIRM_DELAYS) - 1)]
+        attempt += 1
+        if time.time() + delay > deadline:
+            return False
+        time.sleep(delay)
+        try:
+            status = get_signature_statuses([sig])[0]
+        except Exception as e:
+            print(f"[rpc] getSignatureStatuses failed: {e}")
+            status = None
+        if status:
+            if status.get("err"):
+                raise RuntimeError(f"Transaction {sig} failed: {status['err']}")
+            if status.get("confirmationStatus") in ("confirmed", "finalized"):
+                return True
+
 def _send_portal_tx_and_submit(raw_bytes: bytes) -> str:
     """Sign Pump Portal tx and submit to RPC; return signature."""
-    if not WALLET_PRIVATE_KEY:
-        raise RuntimeError("WALLET_PRIVATE_KEY not configured")
+    if WALLET_KP is None:
+        raise RuntimeError("WALLET_PRIVATE_KEY not configured or invalid")
     
     try:
-        kp = Keypair.from_base58_string(WALLET_PRIVATE_KEY)
         portal_tx = VersionedTransaction.from_bytes(raw_bytes)
-        signed = VersionedTransaction(portal_tx.message, [kp])
-
-        cfg = RpcSendTransactionConfig(preflight_commitment=CommitmentLevel.Confirmed)
-        req = SendVersionedTransaction(signed, cfg)
-        r = requests.post(SOLANA_RPC_URL, headers={"Content-Type": "application/json"},
-                          data=req.to_json(), timeout=60)
+        signed = VersionedTransaction(portal_tx.message, [WALLET_KP])
+
+        # Build the sendTransaction request directly from the signed bytes
+        payload = {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "sendTransaction",
+            "params": [base64.b64encode(bytes(signed)).decode(),
+                       {"encoding": "base64", "preflightCommitment": "confirmed"}],
+        }
+        r = SESSION.post(SOLANA_RPC_URL, headers=_JSON_HEADERS,
+                          content=orjson.dumps(payload), timeout=_TRADE_TIMEOUT)
         r.raise_for_status()
-        result = r.json().get("result")
+        reply = orjson.loads(r.content)
+        result = reply.get("result")
         if not result:
-            error_info = r.json().get("error", {})
+            error_info = reply.get("error", {})
             raise RuntimeError(f"Transaction failed: {error_info}")
         return result
     except Exception as e:
         print(f"[ERROR] Failed to submit transaction: {e}")
         raise
 
-def pump_portal_trade_local(data: dict) -> str:
-    resp = requests.post("https://pumpportal.fun/api/trade-local", data=data, timeout=60)
+def _pump_portal_build(data: dict) -> bytes:
+    """Ask Pump Portal for the unsigned tx bytes for a trade/claim."""
+    resp = SESSION.post("https://pumpportal.fun/api/trade-local", data=data, timeout=_TRADE_TIMEOUT)
     resp.raise_for_status()
-    return _send_portal_tx_and_submit(resp.content)
+    return resp.content
+
+def pump_portal_trade_local(data: dict) -> str:
+    return _send_portal_tx_and_submit(_pump_portal_build(data))
 
 # ----- Market data from multiple sources -----
-_HELIUS_CACHE_TTL = 20  # seconds
+_HELIUS_CACHE_TTL = 15  # seconds; also the background refresh interval
+_REFRESH_BUDGET = 6.0   # seconds; whatever hasn't answered by then waits for the next tick
 _last_helius_t = 0.0
 
-def _dexscreener_price_from_pair(pair_id: str) -> tuple[float, Optional[float]]:
-    """Return (price_usd, change_24h_pct|None) from DexScreener for a given pair id."""
+# Supply only moves on burns, so it is cached across refresh ticks. Only
+# successful reads are stored, so a failing RPC is retried on the next refresh.
+# Price data is fetched fresh every tick.
+_supply_cache = TTLCache(maxsize=64, ttl=60)
+
+# Circuit breaker per upstream host: after a few consecutive failures, skip
+# that host for a cooldown so refreshes fail fast to the cached STATE.
+_BREAKER_THRESHOLD = 3
+_BREAKER_COOLDOWN = 30.0  # seconds
+
+@dataclass
+class _Breaker:
+    failures: int = 0
+    opened_at: float = 0.0
+
+    def is_open(self) -> bool:
+        return (self.failures >= _BREAKER_THRESHOLD
+                and time.time() - self.opened_at < _BREAKER_COOLDOWN)
+
+    def record(self, ok: bool):
+        if ok:
+            self.failures = 0
+            return
+        self.failures += 1
+        if self.failures >= _BREAKER_THRESHOLD:
+            self.opened_at = time.time()  # (re)open; one trial call after cooldown
+
+_breakers: dict[str, _Breaker] = {}
+
+async def _call_with_breaker(host: str, fn: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+    breaker = _breakers.setdefault(host, _Breaker())
+    if breaker.is_open():
+        raise RuntimeError(f"circuit open for {host}")
+    try:
+        r = await fn()
+    except asyncio.CancelledError:
+        # cut off by the refresh budget: a blackholed host only ever looks like this
+        breaker.record(False)
+        raise
+    except Exception:
+        breaker.record(False)
+        raise
+    breaker.record(r.status_code < 500 and r.status_code != 429)
+    return r
+
+async def get_json(url: str) -> Any:
+    """GET `url` through its host's circuit breaker and return the JSON body."""
+    r = await _call_with_breaker(
+        httpx.URL(url).host, lambda: ASYNC_CLIENT.get(url, timeout=_MARKET_TIMEOUT))
+    if r.status_code >= 400:
+        raise RuntimeError(f"HTTP {r.status_code} from {url}")
+    return orjson.loads(r.content)
+
+# A mint's decimals never change: learn them from the first supply read
+_TOKEN_DECIMALS: Optional[int] = None
+_DECIMALS_DIVISOR = 1.0
+
+async def _rpc_token_supply(mint: str) -> int:
+    """Fetch current raw token supply from RPC (reflects burns); 0 on failure."""
+    global _TOKEN_DECIMALS, _DECIMALS_DIVISOR
+    try:
+        return _supply_cache[mint]
+    except KeyError:
+        pass
+    try:
+        payload = {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "getTokenSupply",
+            "params": [mint, {"commitment": "confirmed"}],
+        }
+        r = await _call_with_breaker(
+            httpx.URL(SOLANA_RPC_URL).host,
+            lambda: ASYNC_CLIENT.post(SOLANA_RPC_URL, content=orjson.dumps(payload),
+                                      headers=_JSON_HEADERS, timeout=_MARKET_TIMEOUT))
+        if r.status_code >= 400:
+            raise RuntimeError(f"HTTP {r.status_code}")
+        val = (orjson.loads(r.content).get("result") or {}).get("value") or {}
+        amount_raw = int(val.get("amount") or 0)  # decimal string of base units
+        if amount_raw > 0 and _TOKEN_DECIMALS is None:
+            _TOKEN_DECIMALS = int(val.get("decimals") or 0)
+            _DECIMALS_DIVISOR = 10.0 ** _TOKEN_DECIMALS
+    except Exception as e:
+        print(f"[rpc] getTokenSupply failed: {e}")
+        return 0
+    if amount_raw > 0:
+        _supply_cache[mint] = amount_raw
+    return amount_raw
+
+async def _fetch_dexscreener_pair(pair_id: str) -> Optional[dict]:
+    """Return the first DexScreener pair object for `pair_id` (cached), or None."""
     try:
         url = f"https://api.dexscreener.com/latest/dex/pairs/solana/{pair_id}"
-        r = requests.get(url, timeout=15)
-        r.raise_for_status()
-        data = r.json()
+        data = await get_json(url)
         if not data.get("pairs"):
-            return 0.0, None
-        p0 = data["pairs"][0]
-        price = float(p0.get("priceUsd") or 0.0)
-        chg = p0.get("priceChange24h")
-        chg = float(chg) if chg not in (None, "NaN") else None
-        return price, chg
+            print(f"[dexscreener] no pairs found for pair_id: {pair_id}")
+            return None
+        return data["pairs"][0]
     except Exception as e:
-        print(f"[dexscreener] warn: {e}")
-        return 0.0, None
+        print(f"[dexscreener] failed: {e}")
+        return None
 
-def refresh_market_data():
+async def refresh_market_data():
     """Refresh STATE.price_usd / market_cap_usd using DexScreener primarily."""
     global _last_helius_t
     now = time.time()
     if now - _last_helius_t < _HELIUS_CACHE_TTL:
         return
 
-    price = None
-    market_cap = None
-    volume_change = None
-
-    # Helper: fetch current token supply from RPC (reflects burns)
-    def _rpc_token_supply(mint: str) -> tuple[float, int]:
-        try:
-            payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "getTokenSupply",
-                "params": [mint, {"commitment": "confirmed"}],
-            }
-            r = requests.post(SOLANA_RPC_URL, json=payload, timeout=20)
-            r.raise_for_status()
-            val = (r.json().get("result") or {}).get("value") or {}
-            amount_raw = float(val.get("amount") or 0)
-            decimals = int(val.get("decimals") or 0)
-            return amount_raw, decimals
-        except Exception as e:
-            print(f"[rpc] getTokenSupply failed: {e}")
-            return 0.0, 0
-
     # Use DexScreener as primary source
     pair_id = "HV6X26GhkNyUksCEVxReraQU8CLJV8nkiLBq1UEBEvzH"
     # The actual token mint (not the pair ID)
     actual_token_mint = "EHu7quDpKf6gwbKQ5vWZBCcDWFRkfx6B9Pe5SGzupump"
     
-    try:
-        url = f"https://api.dexscreener.com/latest/dex/pairs/solana/{pair_id}"
-        r = requests.get(url, timeout=15)
-        r.raise_for_status()
-        data = r.json()
-        
-        if data.get("pairs") and len(data["pairs"]) > 0:
-            pair = data["pairs"][0]
-            price = float(pair.get("priceUsd", 0))
-            market_cap = float(pair.get("fdv", 0)) or float(pair.get("marketCap", 0))
-            volume_change = pair.get("priceChange", {}).get("h24")  # 24h price change
-            
-            # Always compute MC from on-chain supply (includes burns) if available
-            supply_raw, supply_decimals = _rpc_token_supply(actual_token_mint)
-            if price > 0 and supply_raw > 0:
-                supply_tokens = supply_raw / (10 ** supply_decimals)
-                market_cap = price * supply_tokens
-                print(f"[market_cap] using on-chain supply: {supply_tokens:,.0f} tokens × ${price:.8f} = ${market_cap:,.2f}")
-            elif price > 0:
-                # Only use DexScreener MC if we can't get on-chain supply
-                if market_cap > 0:
-                    print(f"[market_cap] using DexScreener MC: ${market_cap:,.2f}")
-                else:
-                    # Last resort: estimate with 1B supply
-                    estimated_supply = 1_000_000_000
-                    market_cap = price * estimated_supply
-                    print(f"[market_cap] estimated with 1B supply: ${market_cap:,.2f}")
-                
-            if volume_change is not None:
-                try:
-                    volume_change = float(volume_change)
-                except (ValueError, TypeError):
-                    volume_change = 0.0
-            else:
-                volume_change = 0.0
-                
-            if price > 0:
-                print(f"[dexscreener] success: price=${price:.8f}, mc=${market_cap:,.2f}, change24h={volume_change:.2f}%")
-            else:
-                print(f"[dexscreener] no price data available")
+    # Price and on-chain supply are independent, so fetch them concurrently,
+    # bounded by one overall deadline
+    dex_task = asyncio.create_task(_fetch_dexscreener_pair(pair_id))
+    supply_task = asyncio.create_task(_rpc_token_supply(actual_token_mint))
+    _, pending = await asyncio.wait((dex_task, supply_task), timeout=_REFRESH_BUDGET)
+    for task in pending:
+        task.cancel()
+        print(f"[market_data] refresh budget exceeded, skipping {task.get_coro().__name__}")
+    pair = dex_task.result() if dex_task not in pending else None
+    supply_raw = supply_task.result() if supply_task not in pending else 0
+    supply_tokens = supply_raw / _DECIMALS_DIVISOR
+
+    price, market_cap, volume_change = 0.0, 0.0, 0.0
+    if pair:
+        try:
+            price = float(pair.get("priceUsd") or 0.0)
+            market_cap = float(pair.get("fdv") or pair.get("marketCap") or 0.0)
+        except (ValueError, TypeError) as e:
+            print(f"[dexscreener] bad pair data: {e}")
+            price = 0.0
+        try:
+            chg = (pair.get("priceChange") or {}).get("h24")  # 24h price change
+            volume_change = float(chg) if chg not in (None, "NaN") else 0.0
+        except (ValueError, TypeError):
+            volume_change = 0.0
+
+    # Always compute MC from on-chain supply (includes burns) if available
+    if price > 0:
+        if supply_raw > 0:
+            market_cap = price * supply_raw / _DECIMALS_DIVISOR
+            print(f"[market_cap] using on-chain supply: {supply_tokens:,.0f} tokens × ${price:.8f} = ${market_cap:,.2f}")
+        elif market_cap > 0:
+            # Only use DexScreener MC if we can't get on-chain supply
+            print(f"[market_cap] using DexScreener MC: ${market_cap:,.2f}")
         else:
-            print(f"[dexscreener] no pairs found for pair_id: {pair_id}")
-            
-    except Exception as e:
-        print(f"[dexscreener] failed: {e}")
+            # Last resort: estimate with 1B supply
+            estimated_supply = 1_000_000_000
+            market_cap = price * estimated_supply
+            print(f"[market_cap] estimated with 1B supply: ${market_cap:,.2f}")
+
+        print(f"[dexscreener] success: price=${price:.8f}, mc=${market_cap:,.2f}, change24h={volume_change:.2f}%")
+    else:
+        print(f"[dexscreener] no price data available")
 
     # Fallback to development mock data if needed
     if not price and TOKEN_MINT in ["THE_TOKEN_MINT_ADDRESS", "YOUR_TOKEN_MINT_ADDRESS_HERE", ""]:
@@ -237,17 +432,18 @@ def refresh_market_data():
 
     # Store results only if we have a usable update to avoid zero flicker
     if price and float(price) > 0:
-        STATE["price_usd"] = round(float(price), 12)  # More precision for small prices
-        STATE["market_cap_usd"] = round(float(market_cap or 0.0), 2)
-        STATE["volume_change_pct"] = round(float(volume_change or 0.0), 2)
-
-        # Compute supply burned % if we know initial supply and can fetch current supply
-        if TOKEN_INITIAL_SUPPLY > 0:
-            cur_raw, cur_dec = _rpc_token_supply(actual_token_mint)
-            if cur_raw > 0:
-                cur_tokens = cur_raw / (10 ** cur_dec)
-                burn_pct = max(0.0, min(100.0, (1.0 - (cur_tokens / float(TOKEN_INITIAL_SUPPLY))) * 100.0))
+        # Compute supply burned % from the same supply read, if we know initial supply
+        burn_pct = None
+        if TOKEN_INITIAL_SUPPLY > 0 and supply_raw > 0:
+            burn_pct = max(0.0, min(100.0, (1.0 - (supply_tokens / TOKEN_INITIAL_SUPPLY)) * 100.0))
+
+        with _state_lock:
+            STATE["price_usd"] = round(float(price), 12)  # More precision for small prices
+            STATE["market_cap_usd"] = round(float(market_cap or 0.0), 2)
+            STATE["volume_change_pct"] = round(float(volume_change or 0.0), 2)
+            if burn_pct is not None:
                 STATE["supply_burned_pct"] = round(burn_pct, 4)
+            _mark_dirty()
 
         _last_helius_t = now
     else:
@@ -260,17 +456,25 @@ def refresh_market_data():
         print(f"[market_data] failed to get price for token: {TOKEN_MINT}")
 
 # ---------- Actions ----------
+# Overlaps independent network calls inside the (already threaded) pipeline
+_pipeline_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pipeline")
+
 def claim_creator_fees() -> Tuple[str, float]:
     """Claim creator fees, return (signature, claimed_SOL)."""
     if not WALLET_ADDRESS:
         raise RuntimeError("Missing WALLET_ADDRESS")
-    before = get_balance_sol(WALLET_ADDRESS)
-    sig = pump_portal_trade_local({
+    # The pre-claim balance and building the claim tx don't depend on each
+    # other; only submission has to wait for the balance read.
+    before_f = _pipeline_pool.submit(get_balance_sol, WALLET_ADDRESS)
+    raw_tx = _pump_portal_build({
         "publicKey": WALLET_ADDRESS,
         "action": "collectCreatorFee",
         "priorityFee": PRIORITY_FEE,
     })
-    time.sleep(2.0)  # let balance settle
+    before = before_f.result()
+    sig = _send_portal_tx_and_submit(raw_tx)
+    if not wait_for_confirmation(sig):
+        print(f"[WARN] Claim {sig} not confirmed in time; reading balance anyway")
     after = get_balance_sol(WALLET_ADDRESS)
     claimed = max(0.0, round(after - before, 6))
     return sig, claimed
@@ -296,19 +500,24 @@ def burn_recently_bought(amount_sol: float) -> Optional[str]:
     Burn the tokens we just bought.
     Uses the burn_tokens service to actually burn tokens on-chain.
     """
+    if burn_tokens is None:
+        print("[BURN] Error burning tokens: burn service unavailable")
+        return None
     try:
-        from services.burn_tokens import burn_tokens
-        from decimal import Decimal
-        
-        # Import the burn function and burn all tokens in the wallet
         # Since we just bought with amount_sol, we burn everything we have
-        sig = burn_tokens(None, burn_all=True)
-        return sig
-    except Exception as e:
+        return burn_tokens(None, burn_all=True)
+    except (Exception, SystemExit) as e:  # the service reports errors via SystemExit
         print(f"[BURN] Error burning tokens: {e}")
         # Still return None so the calling code can handle gracefully
         return None
 
+_last_processed_mc = 0.0  # market cap seen by the last process_goal_if_crossed call
+
+def _set_pipeline_status(status: str):
+    with _state_lock:
+        STATE["pipeline_status"] = status
+        _mark_dirty()
+
 def process_goal_if_crossed():
     """
     If MC crosses a new 100k bucket since last time:
@@ -317,14 +526,27 @@ def process_goal_if_crossed():
       3) burn the bought tokens
       4) update dashboard state & tx history
     """
-    mc = float(STATE["market_cap_usd"] or 0.0)
-    current_bucket = int(mc // GOAL_STEP)
-    if current_bucket <= STATE["last_goal_bucket"]:
-        return
+    global _last_processed_mc
+    with _state_lock:
+        mc = STATE["market_cap_usd"]
+        if mc == _last_processed_mc:
+            return
+        _last_processed_mc = mc
+        current_bucket = int(mc // GOAL_STEP)
+        if current_bucket <= STATE["last_goal_bucket"]:
+            return
+
+        # we moved into a new bucket — remember it so we won't repeat
+        STATE["last_goal_bucket"] = current_bucket
+        STATE["pipeline_status"] = "claiming"
+        _mark_dirty()
 
-    # we moved into a new bucket — remember it so we won't repeat
-    STATE["last_goal_bucket"] = current_bucket
+    try:
+        _run_goal_pipeline()
+    finally:
+        _set_pipeline_status("idle")
 
+def _run_goal_pipeline():
     # 1) Claim
     try:
         claim_sig, claimed_sol = claim_creator_fees()
@@ -339,22 +561,28 @@ def process_goal_if_crossed():
         push_tx("buyback", 0.0, "No buyback (claimed 0 SOL)")
         return
 
+    _set_pipeline_status("buying back")
     try:
         buy_sig = buy_back_sol(buy_amount)
         push_tx("buyback", buy_amount, f"Executed buy-back of {buy_amount} SOL", buy_sig)
-        STATE["buybacks_usd"] += buy_amount * (STATE["price_usd"] or 0.0)
+        with _state_lock:
+            STATE["buybacks_usd"] += buy_amount * (STATE["price_usd"] or 0.0)
+            _mark_dirty()
     except Exception as e:
         push_tx("buyback", 0.0, f"Buyback failed: {e}")
         return
 
     # 3) Burn what we bought
+    _set_pipeline_status("burning")
     try:
         burn_sig = burn_recently_bought(buy_amount)
         push_tx("burn", buy_amount, f"Burned tokens bought with {buy_amount} SOL", burn_sig)
-        # If you burn 100% of what you bought, credit all of it as "burned_usd"
-        STATE["burned_usd"] += buy_amount * (STATE["price_usd"] or 0.0)
-        # Nudge the visible supply-burned percentage a bit (until you compute it exactly)
-        STATE["supply_burned_pct"] = round(min(100.0, STATE["supply_burned_pct"] + 0.05), 4)
+        with _state_lock:
+            # If you burn 100% of what you bought, credit all of it as "burned_usd"
+            STATE["burned_usd"] += buy_amount * (STATE["price_usd"] or 0.0)
+            # Nudge the visible supply-burned percentage a bit (until you compute it exactly)
+            STATE["supply_burned_pct"] = round(min(100.0, STATE["supply_burned_pct"] + 0.05), 4)
+            _mark_dirty()
     except Exception as e:
         push_tx("burn", 0.0, f"Burn failed: {e}")
 
@@ -368,6 +596,7 @@ class Dashboard(BaseModel):
     next_goal_usd: float
     next_goal_progress_pct: float
     supply_burned_pct: float
+    pipeline_status: str
     transactions: list
     token_mint: str
 
@@ -375,39 +604,117 @@ class DevAdjust(BaseModel):
     amount_usd: float
     note: Optional[str] = None
 
-# ---------- Endpoints ----------
-@app.get("/dashboard", response_model=Dashboard)
-def get_dashboard():
-    # 1) Refresh price / MC from multiple sources (cached ~20s)
-    refresh_market_data()
-
-    # 2) If a new +$100k bucket was crossed, run the pipeline
-    process_goal_if_crossed()
-
-    # 3) Compute progress within the *current* 100k bucket
-    mc = float(STATE["market_cap_usd"] or 0.0)
-    bucket_start = (int(mc // GOAL_STEP)) * GOAL_STEP
+# ---------- Dashboard rendering ----------
+# Serialized /dashboard body and the STATE["_version"] it was built from
+_cached_version = -1
+_cached_json = b""
+# Polling clients/proxies may reuse a body briefly; STATE moves on ~15s ticks
+_DASHBOARD_HEADERS = {"Cache-Control": "public, max-age=5"}
+
+def _dashboard_body() -> bytes:
+    """Return the serialized dashboard, re-rendering only when STATE has changed."""
+    global _cached_version, _cached_json
+    if STATE["_version"] == _cached_version:
+        return _cached_json
+
+    # Take a consistent snapshot, then build the response outside the lock
+    with _state_lock:
+        snap = STATE.copy()
+        tx = list(STATE["tx"])
+    version = snap["_version"]
+    tx = [{**t, "timestamp": ts_iso(t["timestamp"])} for t in tx]
+
+    # Compute progress within the *current* bucket
+    mc = snap["market_cap_usd"]  # always a float, see refresh_market_data
+    bucket = int(mc // GOAL_STEP)
+    bucket_start = bucket * GOAL_STEP
     next_goal = bucket_start + GOAL_STEP
     progress_pct = 0.0 if GOAL_STEP <= 0 else max(0.0, min(100.0, (mc - bucket_start) / GOAL_STEP * 50.0))
 
-    return {
-        "price_usd": STATE["price_usd"],
-        "volume_change_pct": STATE["volume_change_pct"],
-        "buybacks_usd": STATE["buybacks_usd"],
-        "burned_usd": STATE["burned_usd"],
+    payload = {
+        "price_usd": snap["price_usd"],
+        "volume_change_pct": snap["volume_change_pct"],
+        "buybacks_usd": snap["buybacks_usd"],
+        "burned_usd": snap["burned_usd"],
         "market_cap_usd": mc,
         "next_goal_usd": next_goal,
         "next_goal_progress_pct": round(progress_pct, 2),
-        "supply_burned_pct": STATE["supply_burned_pct"],
-        "transactions": STATE["tx"],
+        "supply_burned_pct": snap["supply_burned_pct"],
+        "pipeline_status": snap["pipeline_status"],
+        "transactions": tx,
         "token_mint": TOKEN_MINT,
     }
+    _cached_json = orjson.dumps(payload)
+    _cached_version = version
+    return _cached_json
+
+# ---------- Background refresher ----------
+_refresher_task: Optional[asyncio.Task] = None
+_pipeline_task: Optional[asyncio.Task] = None
+_pipeline_lock = asyncio.Lock()  # one claim/buy/burn run at a time
+
+async def _run_pipeline():
+    async with _pipeline_lock:
+        # the pipeline blocks on RPC calls, keep it off the event loop
+        await asyncio.to_thread(process_goal_if_crossed)
+
+async def _refresher_loop():
+    """Refresh market data and run the goal pipeline off the request path."""
+    global _pipeline_task
+    while True:
+        try:
+            await refresh_market_data()
+            # A running pipeline can take several seconds; don't stall price
+            # refreshes behind it, and don't start a second one.
+            if not _pipeline_lock.locked():
+                _pipeline_task = asyncio.create_task(_run_pipeline())
+            _dashboard_body()  # bake the response so requests only copy bytes
+        except Exception as e:
+            print(f"[refresher] error: {e}")
+        await asyncio.sleep(_HELIUS_CACHE_TTL)
+
+@app.on_event("startup")
+async def _start_refresher():
+    global _refresher_task
+    _refresher_task = asyncio.create_task(_refresher_loop())
+
+@app.on_event("shutdown")
+async def _stop_refresher():
+    if _refresher_task is not None:
+        _refresher_task.cancel()
+    # A running pipeline thread can't be cancelled; let it finish with the
+    # clients still open rather than fail mid-run after a claim has landed.
+    if _pipeline_task is not None and not _pipeline_task.done():
+        try:
+            await _pipeline_task
+        except Exception as e:
+            print(f"[pipeline] error during shutdown: {e}")
+    _pipeline_pool.shutdown(wait=True)
+    await ASYNC_CLIENT.aclose()
+    SESSION.close()
+
+# ---------- Endpoints ----------
+# Dashboard documents the schema only; the body is pre-serialized from our own
+# typed STATE, so it is never run through pydantic validation.
+@app.get("/dashboard", response_class=Response, responses={200: {"model": Dashboard}})
+async def get_dashboard():
+    # The body is pre-baked by _refresher_loop and only rebuilt here if STATE
+    # changed since (pipeline / dev writes between ticks).
+    return Response(content=_dashboard_body(), media_type="application/json",
+                    headers=_DASHBOARD_HEADERS)
 
 @app.post("/simulate/bump-mc")
-def bump_market_cap(delta_usd: float = 110_000):
+async def bump_market_cap(delta_usd: float = 110_000):
     """Dev helper: bump MC to force a bucket-crossing locally."""
-    STATE["market_cap_usd"] += float(delta_usd)
-    return {"market_cap_usd": STATE["market_cap_usd"]}
+    global _pipeline_task
+    with _state_lock:
+        STATE["market_cap_usd"] += float(delta_usd)
+        _mark_dirty()
+        mc = STATE["market_cap_usd"]
+    # Check the goal now: the next refresh would overwrite the bumped MC first
+    if not _pipeline_lock.locked():
+        _pipeline_task = asyncio.create_task(_run_pipeline())
+    return {"market_cap_usd": mc}
 
 @app.get("/health")
 def health():
@@ -415,7 +722,7 @@ def health():
 
 # ---------- Debug endpoint ----------
 @app.get("/debug/market-data")
-def debug_market_data():
+async def debug_market_data():
     """Debug endpoint to check market data sources."""
     debug_info = {
         "token_mint": TOKEN_MINT,
@@ -429,7 +736,8 @@ def debug_market_data():
     # Force refresh market data for debugging
     global _last_helius_t
     _last_helius_t = 0  # Force refresh
-    refresh_market_data()
+    _supply_cache.clear()
+    await refresh_market_data()
     
     debug_info["after_refresh"] = {
         "price_usd": STATE["price_usd"],
@@ -444,20 +752,28 @@ def dev_buyback(adjust: DevAdjust):
     amt = max(0.0, float(adjust.amount_usd or 0.0))
     if amt <= 0:
         return {"ok": False, "error": "amount_usd must be > 0"}
-    STATE["buybacks_usd"] += amt
-    push_tx("buyback", amt / max(STATE.get("price_usd") or 1, 1e-9), adjust.note or "Dev buyback credit")
-    return {"ok": True, "buybacks_usd": STATE["buybacks_usd"]}
+    with _state_lock:
+        STATE["buybacks_usd"] += amt
+        _mark_dirty()
+        total = STATE["buybacks_usd"]
+        price = STATE["price_usd"]
+    push_tx("buyback", amt / max(price or 1, 1e-9), adjust.note or "Dev buyback credit")
+    return {"ok": True, "buybacks_usd": total}
 
 @app.post("/dev/burn")
 def dev_burn(adjust: DevAdjust):
     amt = max(0.0, float(adjust.amount_usd or 0.0))
     if amt <= 0:
         return {"ok": False, "error": "amount_usd must be > 0"}
-    STATE["burned_usd"] += amt
-    push_tx("burn", amt / max(STATE.get("price_usd") or 1, 1e-9), adjust.note or "Dev burn credit")
-    # Optionally nudge supply_burned_pct slightly to reflect action visually
-    STATE["supply_burned_pct"] = round(min(100.0, STATE["supply_burned_pct"] + 0.01), 4)
-    return {"ok": True, "burned_usd": STATE["burned_usd"]}
+    with _state_lock:
+        STATE["burned_usd"] += amt
+        # Optionally nudge supply_burned_pct slightly to reflect action visually
+        STATE["supply_burned_pct"] = round(min(100.0, STATE["supply_burned_pct"] + 0.01), 4)
+        _mark_dirty()
+        total = STATE["burned_usd"]
+        price = STATE["price_usd"]
+    push_tx("burn", amt / max(price or 1, 1e-9), adjust.note or "Dev burn credit")
+    return {"ok": True, "burned_usd": total}
 
 @app.post("/dev/seed-history")
 def dev_seed_history():
@@ -469,12 +785,15 @@ def dev_seed_history():
     push_tx("burn", 3.1, "Historical burn #2", "9N4...jkl")
     
     # Update totals
-    STATE["buybacks_usd"] += 6.7  # 2.5 + 4.2
-    STATE["burned_usd"] += 4.9    # 1.8 + 3.1
+    with _state_lock:
+        STATE["buybacks_usd"] += 6.7  # 2.5 + 4.2
+        STATE["burned_usd"] += 4.9    # 1.8 + 3.1
+        _mark_dirty()
+        buybacks, burned = STATE["buybacks_usd"], STATE["burned_usd"]
     
     return {
         "ok": True, 
-        "buybacks_usd": STATE["buybacks_usd"],
-        "burned_usd": STATE["burned_usd"],
+        "buybacks_usd": buybacks,
+        "burned_usd": burned,
         "transactions_added": 4
     }
@@ -9,4 +9,4 @@ cd backend
 pip install -r requirements.txt
 
 # Start the server
-uvicorn main:app --host 0.0.0.0 --port 8000 --reload
+uvicorn main:app --host 0.0.0.0 --port 8000 --loop uvloop --http httptools --reload